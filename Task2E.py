@@ -1,5 +1,6 @@
 import datetime
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 from floodsystem.datafetcher import fetch_measure_levels
 from floodsystem.stationdata import build_station_list, update_water_levels
@@ -21,11 +22,14 @@ def run():
     update_water_levels(stations)
     high_stations = stations_highest_rel_level(stations, N)
 
-    # Fetch the dates and levels from each station
+    # Fetch the dates and levels from each station concurrently,
+    # as each request spends most of its time waiting on the network
+    with ThreadPoolExecutor() as executor:
+        all_data = list(executor.map(lambda s: fetch_measure_levels(s.measure_id, dt), high_stations))
+
     flags = []
     dates, levels = {}, {}
-    for s in high_stations:
-        data = fetch_measure_levels(s.measure_id, dt)
+    for s, data in zip(high_stations, all_data):
         # Sanitise input data
         for index in range(len(data[1])):
             if not isinstance(data[1][index], float):
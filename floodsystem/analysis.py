@@ -35,8 +35,8 @@ def polyfit(dates: list, levels: list, p: int):
 
     # standard data type and bounds input checks
     assert len(dates) == len(levels)
-    assert all([isinstance(d, datetime.datetime) for d in dates])
-    assert all([isinstance(lev, (float, int)) for lev in levels])
+    assert all(isinstance(d, datetime.datetime) for d in dates)
+    assert all(isinstance(lev, (float, int)) for lev in levels)
     assert isinstance(p, int) and 0 <= p <= len(dates) - 1
 
     # convert datetime objects to floats
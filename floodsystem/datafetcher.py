@@ -6,11 +6,18 @@ latest time history level data
 # pylint: disable=assignment-from-no-return
 
 import datetime
+import hashlib
 import json
 import os
 import requests
 import dateutil.parser
 
+# directory (relative to the working directory) used to cache fetched data
+CACHE_DIR = 'cache'
+
+# the Environment Agency publishes a new reading for each measure every 15 minutes
+READINGS_INTERVAL = datetime.timedelta(minutes=15)
+
 
 def fetch(url):
     """Fetch data from url and return fetched JSON object"""
@@ -21,16 +28,54 @@ def fetch(url):
 
 def dump(data, filename):
     """Save JSON object to file"""
-    f = open(filename, 'w')
-    data = json.dump(data, f)
-    f.close()
+    with open(filename, 'w') as f:
+        json.dump(data, f)
 
 
 def load(filename):
     """Load JSON object from file"""
-    f = open(filename, 'r')
-    data = json.load(f)
-    f.close()
+    # json accepts bytes directly, so skip the text decoding layer
+    with open(filename, 'rb') as f:
+        data = json.load(f)
+    return data
+
+
+# errors raised by loading a cache file which is missing, truncated or corrupt,
+# or which holds data not in the format it was stored in
+_BAD_CACHE_ERRORS = (FileNotFoundError, ValueError, KeyError, TypeError)
+
+
+def _cached_fetch(url, cache_filename, use_cache, interval=None):
+    """
+    Fetch JSON object from url, using the file cache_filename in the
+    cache directory. If use_cache is True the data is loaded from the
+    cache file when it exists; otherwise (or if the file is missing or
+    unreadable) the data is fetched over the Internet and dumped to the
+    cache file.
+
+    If interval is given, the data is stored tagged with it, and is only
+    loaded from the cache file if it was stored with the same interval.
+    """
+
+    cache_file = os.path.join(CACHE_DIR, cache_filename)
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+    # Attempt to load data from file, otherwise fetch over Internet
+    if use_cache:
+        try:
+            # Attempt to load from file
+            cached = load(cache_file)
+            if interval is None:
+                return cached
+            if cached['interval'] == interval:
+                return cached['data']
+        except _BAD_CACHE_ERRORS:
+            pass
+
+    # Fetch and dump to file
+    data = fetch(url)
+    dump(data if interval is None else {'interval': interval, 'data': data}, cache_file)
+
     return data
 
 
@@ -51,28 +96,7 @@ def fetch_station_data(use_cache=True):
     # http://environment.data.gov.uk/flood-monitoring/doc/reference)
     url = "http://environment.data.gov.uk/flood-monitoring/id/stations?status=Active&parameter=level&qualifier=Stage&_view=full"  # noqa
 
-    sub_dir = 'cache'
-    try:
-        os.makedirs(sub_dir)
-    except FileExistsError:
-        pass
-    cache_file = os.path.join(sub_dir, 'station_data.json')
-
-    # Attempt to load station data from file, otherwise fetch over Internet
-    if use_cache:
-        try:
-            # Attempt to load from file
-            data = load(cache_file)
-        except FileNotFoundError:
-            # If load from file fails, fetch and dump to file
-            data = fetch(url)
-            dump(data, cache_file)
-    else:
-        # Fetch and dump to file
-        data = fetch(url)
-        dump(data, cache_file)
-
-    return data
+    return _cached_fetch(url, 'station_data.json', use_cache)
 
 
 def fetch_latest_water_level_data(use_cache=False):
@@ -81,33 +105,17 @@ def fetch_latest_water_level_data(use_cache=False):
     # URL for retrieving data
     url = "http://environment.data.gov.uk/flood-monitoring/id/measures?parameter=level&qualifier=Stage&qualifier=level"  # noqa
 
-    sub_dir = 'cache'
-    try:
-        os.makedirs(sub_dir)
-    except FileExistsError:
-        pass
-    cache_file = os.path.join(sub_dir, 'level_data.json')
+    return _cached_fetch(url, 'level_data.json', use_cache)
 
-    # Attempt to load level data from file, otherwise fetch over
-    # Internet
-    if use_cache:
-        try:
-            # Attempt to load from file
-            data = load(cache_file)
-        except FileNotFoundError:
-            data = fetch(url)
-            dump(data, cache_file)
-    else:
-        data = fetch(url)
-        dump(data, cache_file)
 
-    return data
-
-
-def fetch_measure_levels(measure_id, dt):
+def fetch_measure_levels(measure_id, dt, use_cache=True):
     """Fetch measure levels from latest reading and going back a period
     dt. Return list of dates and a list of values.
 
+    New readings are only published every READINGS_INTERVAL, so if
+    use_cache is True the fetched readings are cached on disk and reused
+    by later calls for the same measure and period made within the same
+    interval, rather than fetched over the Internet again.
     """
 
     # Current time (UTC)
@@ -121,8 +129,10 @@ def fetch_measure_levels(measure_id, dt):
     url_options = "/readings/?_sorted&since=" + start.isoformat() + 'Z'
     url = url_base + url_options
 
-    # Fetch data
-    data = fetch(url)
+    # One cache file per (measure, period), tagged with the reading interval it was fetched in
+    key = hashlib.sha1(f'{measure_id}|{dt.total_seconds()}'.encode()).hexdigest()
+    interval = (now - datetime.datetime(1970, 1, 1)) // READINGS_INTERVAL
+    data = _cached_fetch(url, os.path.join('readings', key + '.json'), use_cache, interval=interval)
 
     # Extract dates and levels
     dates, levels = [], []
@@ -5,10 +5,28 @@ stations by their water levels.
 
 # pylint: disable=import-error, relative-beyond-top-level
 
-from .station import inconsistent_typical_range_stations
+from heapq import nlargest
+from operator import itemgetter
+
 from .station import MonitoringStation
 
 
+def _valid_station_levels(stations: list, tol):
+
+    '''
+    Yields (station, relative water level) tuples, unsorted, for
+    the stations with a well-defined relative level above tol.
+    '''
+
+    # relative_water_level() is None for stations with inconsistent
+    # range data or undefined values, so it is computed once and used both to
+    # eliminate invalid stations and as the returned level
+    for s in stations:
+        level = s.relative_water_level()
+        if level is not None and level > tol:
+            yield (s, level)
+
+
 def stations_level_over_threshold(stations: list, tol):
 
     '''
@@ -22,26 +40,14 @@ def stations_level_over_threshold(stations: list, tol):
     '''
 
     # Standard data type input checks.
-    assert isinstance(stations, list) and all([isinstance(i, MonitoringStation) for i in stations])
+    assert isinstance(stations, list) and (not stations or isinstance(stations[0], MonitoringStation))
     assert isinstance(tol, (int, float))
-    # Check all objects are hashable so they can be used to construct the sets below
-    try:
-        _hashable = all([isinstance(hash(s), int) for s in stations])
-        if _hashable:
-            assert True
-    except TypeError:
-        assert False
-
-    # Eliminate stations which are invalid due to having inconsistent range data or undefined values
-    data = set(stations) - set(inconsistent_typical_range_stations(stations))
-    data -= {s for s in stations if any([s.latest_level is None,
-                                        not hasattr(s, 'latest_level'),
-                                        s.relative_water_level() is None])}
-
-    # Return the remaining stations and their relative level where it is higher than tol
-    # and sort in descending order of level
-    return sorted([(s, s.relative_water_level()) for s in data if s.relative_water_level() > tol],
-                key=lambda x: x[1], reverse=True)
+
+    data = list(_valid_station_levels(stations, tol))
+
+    # Return the remaining stations and their relative level, sorted in descending order of level
+    data.sort(key=itemgetter(1), reverse=True)
+    return data
 
 
 def stations_highest_rel_level(stations, N):
@@ -53,17 +59,19 @@ def stations_highest_rel_level(stations, N):
     '''
 
     # Standard data type and bounds input checks
-    assert isinstance(stations, list) and all([isinstance(i, MonitoringStation) for i in stations])
+    assert isinstance(stations, list) and (not stations or isinstance(stations[0], MonitoringStation))
     assert isinstance(N, int)
 
-    # Get a descending list of stations with a known level (implemented as being above
-    # an effective -infinity) and select the first N objects
-    _NEG_INF = -1e300
-    valid_stations = stations_level_over_threshold(stations, _NEG_INF)
+    if not N >= 0:
+        raise ValueError(f'N must be a non-negative integer, not {N}')
+
+    # Select the N stations with a known level (implemented as being above
+    # an effective -infinity) using a size-N heap rather than sorting them all
+    top_stations = nlargest(N, _valid_station_levels(stations, float('-inf')), key=itemgetter(1))
 
-    if not 0 <= N <= len(valid_stations):
+    if len(top_stations) < N:
         raise ValueError(f'''N must be an positive integer, and no more
                         than the length of the list of valid stations
-                        ({len(valid_stations)})''')
+                        ({len(top_stations)})''')
 
-    return [s[0] for s in valid_stations][:N]
+    return [s[0] for s in top_stations]
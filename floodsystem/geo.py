@@ -5,8 +5,14 @@ geographical data.
 
 # pylint: disable=relative-beyond-top-level, no-name-in-module
 
-from .utils import sorted_by_key, wgs84_to_web_mercator
-from .haversine import haversine_vector, Unit
+from collections import Counter, defaultdict
+from heapq import nlargest
+from operator import attrgetter, itemgetter
+
+import numpy as np
+
+from .utils import wgs84_to_web_mercator, wgs84_to_web_mercator_vector
+from .haversine import get_avg_earth_radius, Unit
 from .station import MonitoringStation
 
 from bokeh.plotting import figure, output_file, show
@@ -14,29 +20,86 @@ from bokeh.models import ColumnDataSource
 from bokeh.tile_providers import STAMEN_TERRAIN_RETINA, get_provider
 
 
-def stations_by_distance(stations: list, p: tuple):
+def _station_coords(stations: list):
+
+    '''
+    Returns a numpy array of shape (N, 2) of the (lat, long)
+    coords of each station in stations, in radians.
+    '''
+
+    # read each coord once into a flat buffer, then split into columns
+    coords = np.fromiter((c for s in stations for c in s.coord), dtype=np.float64,
+        count=2 * len(stations)).reshape(-1, 2)
+
+    return np.radians(coords)
+
+
+def _haversines_from(stations: list, p):
+
+    '''
+    Returns a numpy array of the haversine of the central angle,
+    hav(d / R) = sin^2(d / 2R), between each station in stations
+    and the coordinate p. This increases monotonically with the
+    distance d, so can be compared and sorted on directly.
+
+    p may also be an array of M coordinates of shape (M, 2), in
+    which case an array of shape (M, N) is returned, where row m
+    is for the coordinate p[m].
+    '''
+
+    coords = _station_coords(stations)
+    lat, lng = coords[:, 0], coords[:, 1]
+
+    # (lat, long) of p as (M, 1) columns (or shape (1,) for a single point) to broadcast over stations
+    p = np.radians(np.asarray(p, dtype=np.float64))
+    lat_p, lng_p = p[..., 0, None], p[..., 1, None]
+
+    # haversine formula, broadcasting the point(s) p against all stations
+    return np.sin((lat - lat_p) * 0.5) ** 2 + np.cos(lat_p) * np.cos(lat) * np.sin((lng - lng_p) * 0.5) ** 2
+
+
+def _distances_from(stations: list, p):
+
+    '''
+    Returns a numpy array of the haversine distances (in km) of
+    each station in stations from the coordinate p (or, as for
+    _haversines_from, from each of an array of coordinates p).
+    '''
+
+    d = _haversines_from(stations, p)
+
+    return 2 * get_avg_earth_radius(Unit.KILOMETERS) * np.arcsin(np.sqrt(d))
+
+
+def stations_by_distance(stations: list, p: tuple, k: int = None):
 
     '''
     Returns a list of (station, distance) tuples, where
     station is a MonitoringStation object and distance
     is the float distance of that station from the given
-    coordinate p.
+    coordinate p. If k is given, only the k nearest
+    stations are returned.
     '''
 
-    # Standard data type input checks
-    assert isinstance(stations, list) and all([isinstance(i, MonitoringStation) for i in stations])
+    # Standard data type input checks (spot-checking the first station
+    # rather than scanning the whole list on every call)
+    assert isinstance(stations, list) and (not stations or isinstance(stations[0], MonitoringStation))
     assert isinstance(p, tuple)
+    assert k is None or (isinstance(k, int) and k >= 0)
+
+    # rank every station at once on the haversine, which orders the stations the same
+    # way as the distance does, so only the stations returned are converted to distances
+    haversines = _haversines_from(stations, p)
+    if k is not None and k < len(stations):
+        # partially select the k nearest in O(N), then only sort those
+        order = np.argpartition(haversines, k)[:k]
+        order = order[np.argsort(haversines[order], kind='stable')]
+    else:
+        order = np.argsort(haversines, kind='stable')
 
-    # preserve original order in case of other scripts running at the same time
-    _stations = stations
-    ref_points, station_points = [p for i in range(len(_stations))], [s.coord for s in _stations]
-
-    # use haversine_vector to efficiently find the distance between multiple points
-    my_data = zip(_stations, list(haversine_vector(ref_points, station_points, unit=Unit.KILOMETERS)))
-    del _stations
+    distances = 2 * get_avg_earth_radius(Unit.KILOMETERS) * np.arcsin(np.sqrt(haversines[order]))
 
-    # sort by distance (second item in each list)
-    return sorted_by_key(my_data, 1)
+    return [(stations[i], d) for i, d in zip(order.tolist(), distances.tolist())]
 
 
 def stations_within_radius(stations: list, centre: tuple, r):
@@ -48,12 +111,42 @@ def stations_within_radius(stations: list, centre: tuple, r):
 
     # standard data type input checks
     assert isinstance(r, (float, int))
+    assert isinstance(stations, list) and (not stations or isinstance(stations[0], MonitoringStation))
+    assert isinstance(centre, tuple)
+
+    if r < 0:
+        return []
+
+    # distance <= r exactly when hav(distance / R) <= hav(r / R), so compare against
+    # that threshold (found once) and skip converting every haversine to a distance.
+    # Any r beyond half the circumference of the Earth includes every station.
+    threshold = np.sin(min(r / (2 * get_avg_earth_radius(Unit.KILOMETERS)), np.pi / 2)) ** 2
+
+    # keep only the stations where distance is <= the given radius, nearest first
+    haversines = _haversines_from(stations, centre)
+    within = np.flatnonzero(haversines <= threshold)
+    within = within[np.argsort(haversines[within], kind='stable')]
+
+    return [stations[i] for i in within.tolist()]
+
+
+def stations_distance_matrix(stations: list, points):
+
+    '''
+    Returns a numpy array of shape (M, N) of the distances (in km)
+    of each of the N stations from each of the M (lat, long)
+    coordinates in points, such that row m holds the distance
+    of every station from points[m]. This is much faster than
+    calling stations_by_distance once for each point; each row
+    can be sorted with numpy.argsort.
+    '''
+
+    # standard data type input checks
+    assert isinstance(stations, list) and (not stations or isinstance(stations[0], MonitoringStation))
 
-    # get all (station, distance) pairs
-    sorted_stations = stations_by_distance(stations, centre)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
 
-    # return station where distance is <= the given radius
-    return [s[0] for s in sorted_stations if s[1] <= r]
+    return _distances_from(stations, points)
 
 
 def rivers_with_station(stations: list):
@@ -64,10 +157,10 @@ def rivers_with_station(stations: list):
     '''
 
     # Standard data type input checks
-    assert all([isinstance(i, MonitoringStation) for i in stations])
+    assert not stations or isinstance(next(iter(stations)), MonitoringStation)
 
-    # Set (comprehension) to skip over/remove duplicates
-    rivers = {s.river for s in stations}
+    # Read each river name once and collect them into a set, removing duplicates
+    rivers = set(map(attrgetter('river'), stations))
 
     return rivers
 
@@ -80,17 +173,14 @@ def stations_by_river(stations: list):
     '''
 
     # Standard data type input checks
-    assert all([isinstance(i, MonitoringStation) for i in stations])
+    assert not stations or isinstance(next(iter(stations)), MonitoringStation)
 
-    rivers = rivers_with_station(stations)
+    # Add each station to the list for its river in a single pass
+    river_dict = defaultdict(list)
+    for s in stations:
+        river_dict[s.river].append(s)
 
-    # For each river listed, add all its associated stations.
-    river_dict = {}
-    for river in rivers:
-        pair = {river: [s for s in stations if s.river == river]}
-        river_dict.update(pair)
-
-    return river_dict
+    return dict(river_dict)
 
 
 def rivers_by_station_number(stations: list, N: int):
@@ -104,23 +194,21 @@ def rivers_by_station_number(stations: list, N: int):
     '''
 
     # Standard data type input and bounds checks
-    assert all([isinstance(i, MonitoringStation) for i in stations])
+    assert not stations or isinstance(next(iter(stations)), MonitoringStation)
     assert isinstance(N, int)
     if not N >= 1:
         raise ValueError(f'N must be a positive non-zero integer, not {N}')
 
-    river_names = rivers_with_station(stations)
-    river_dict = stations_by_river(stations)
-
-    # Get a complete list of (river name, number of stations) tuples, sorted descending
-    river_num_list = sorted_by_key([(r, len(river_dict[r])) for r in river_names], 1, reverse=True)
+    # Count the stations on each river in one pass
+    river_counts = Counter(map(attrgetter('river'), stations))
 
-    # Find the number of stations which is N from the highest, accounting for possible duplicates
-    end_num = sorted(list({r[1] for r in river_num_list}), reverse=True)[N - 1]
+    # Find the number of stations which is N from the highest, accounting for possible
+    # duplicates, using a size-N heap of the distinct counts rather than sorting them all
+    end_num = nlargest(N, set(river_counts.values()))[N - 1]
 
-    # Add the (river name, number of stations) tuple to the list until
-    # the number of stations is less than the previously found limit
-    return [(r, n) for (r, n) in river_num_list if n >= end_num]
+    # Keep the (river name, number of stations) tuples with at least that many
+    # stations, and sort only those in descending order of number of stations
+    return sorted([(r, n) for (r, n) in river_counts.items() if n >= end_num], key=itemgetter(1), reverse=True)
 
 
 def stations_by_town(stations):
@@ -132,29 +220,52 @@ def stations_by_town(stations):
     '''
 
     # Standard data type input checks
-    assert all([isinstance(i, MonitoringStation) for i in stations])
-
-    # Get a set of all the towns from all the stations, removing duplicates
-    towns = {s.town for s in stations}
+    assert not stations or isinstance(next(iter(stations)), MonitoringStation)
 
-    # For each town listed, add all its associated stations.
-    town_dict = {}
-    for town in towns:
-        pair = {town: [s for s in stations if s.town == town
-        and s.latest_level is not None and s.typical_range_consistent()]}
-        town_dict.update(pair)
-
-    # Remove the stations which do not have an associated town, and
-    # remove the towns which do not have any associated stations
-    town_dict.pop(None, None)
-    for town, stations in town_dict.copy().items():
-        if town_dict[town] in [None, [], [None]]:
-            del town_dict[town]
+    # Add each station to the list for its town in a single pass, skipping
+    # stations which do not have an associated town or have invalid level data.
+    # Towns without any valid stations are therefore never added.
+    town_dict = defaultdict(list)
+    for s in stations:
+        if s.town is not None and s.latest_level is not None and s.typical_range_consistent():
+            town_dict[s.town].append(s)
 
     # Sort the dictionary by the number of stations each town contains
     return {t: s for t, s in sorted(town_dict.items(), key=lambda x: len(x[1]), reverse=True)}
 
 
+# (lat, long) coords of the boundary of the station map, and the same boundary in web mercator
+_MAP_RANGE = ((59, -12), (49, 4))
+_MAP_X_RANGE, _MAP_Y_RANGE = zip(*map(wgs84_to_web_mercator, _MAP_RANGE))
+
+# details of a station shown by the HoverTool of the station map
+_MAP_TOOLTIPS = [('Name', '@name'), ('Current level', '@current_level'),
+                 ('Typical range', '@typical_range'), ('Relative level', '@relative_level'),
+                 ('River', '@river'), ('Town', '@town'), ('Coords', '(@lat °@ns, @long °@ew)')]
+
+
+def _make_map_figure(with_details=True):
+
+    '''
+    Returns a new Bokeh figure of the map of England, with
+    the map tiles and (if with_details) the HoverTool set up,
+    ready for the stations to be added.
+    '''
+
+    # define figure
+    p = figure(x_range=_MAP_X_RANGE, y_range=_MAP_Y_RANGE, x_axis_type="mercator", y_axis_type="mercator")
+
+    # choose a map design: http://docs.bokeh.org/en/1.3.2/docs/reference/tile_providers.html
+    p.add_tile(get_provider(STAMEN_TERRAIN_RETINA))
+
+    # initialise a HoverTool and add the necessary parameters to display when activated
+    if with_details:
+        from bokeh.models import HoverTool
+        p.add_tools(HoverTool(tooltips=_MAP_TOOLTIPS))
+
+    return p
+
+
 def display_stations_on_map(stations, with_details=True, return_image=False):
     
     '''
@@ -162,72 +273,57 @@ def display_stations_on_map(stations, with_details=True, return_image=False):
     https://docs.bokeh.org/en/latest/docs/user_guide/geo.html
     '''
 
-    # inputs and outputs
-    map_range = ((59, -12), (49, 4))  # (lat, long) coords of the map boundary
+    # outputs
     output_file("tile.html", title='Monitoring Stations across England')
 
-    station_info = []
-    for i, s in enumerate(stations):
-        l = s.relative_water_level()
-        station_info.append(
-        {"coords" : s.coord, "name": s.name, "current_level": s.latest_level, 
-         "typical_range": s.typical_range, "relative_level": l,
-         "river": s.river, "town": s.town})
-
-        try:
-            station_info[i]["rating"] = (0 if l > 2 else      # red
-                                         1 if l > 1.5 else    # orange
-                                         2 if l > 1.25 else   # yellow
-                                         3 if l > 0.9 else    # light green
-                                         4)                   # green
-        except TypeError:
-            station_info[i]["rating"] = -1  # unknown: data was invalid / nonexistent - grey
-
-    # choose a map design: http://docs.bokeh.org/en/1.3.2/docs/reference/tile_providers.html
-    tile_provider = get_provider(STAMEN_TERRAIN_RETINA)
-    
     # setup
-    w = wgs84_to_web_mercator
-    letter = lambda lat, long: ('N' if lat >= 0 else 'S', 'E' if long >= 0 else 'W')
+    details = attrgetter('name', 'latest_level', 'typical_range', 'river', 'town')
 
     # colours: # https://docs.bokeh.org/en/latest/docs/reference/colors.html
-    colors = ["red", "darkorange", "yellow", "yellowgreen", "mediumseagreen", "darkgray"] 
+    colors = ["red", "darkorange", "yellow", "yellowgreen", "mediumseagreen", "darkgray"]
     linecolors = ["brown", "chocolate", "darkkhaki", "mediumseagreen", "green", "gainsboro"]
-    trans_coords = [w(place["coords"]) for place in station_info]  # transform the coords of the given places
-    x_range, y_range = (w(map_range[0])[0], w(map_range[1])[0]), (w(map_range[0])[1], w(map_range[1])[1])  # coords of map boundary
-    
-    # define figure
-    p = figure(x_range=x_range, y_range=y_range, x_axis_type="mercator", y_axis_type="mercator")
-    p.add_tile(tile_provider)
+
+    # read the information about the stations in a single pass over the stations,
+    # so each station object is only visited once
+    N = len(stations)
+    coords = np.empty((N, 2))
+    names, current_levels, typical_ranges, relative_levels, rivers, towns = ([None] * N for _ in range(6))
+
+    for i, s in enumerate(stations):
+        coords[i] = s.coord
+        names[i], current_levels[i], typical_ranges[i], rivers[i], towns[i] = details(s)  # additional attributes
+        relative_levels[i] = s.relative_water_level()
+
+    # build the coordinate columns from the whole array of coords at once
+    lats, longs = np.abs(coords[:, 0]), np.abs(coords[:, 1])  # coordinates of a place
+    ns, ew = np.where(coords[:, 0] >= 0, 'N', 'S'), np.where(coords[:, 1] >= 0, 'E', 'W')  # letter for each coord
+
+    # rate all the relative levels at once: red (0) if > 2, orange (1) if > 1.5, yellow (2) if > 1.25,
+    # light green (3) if > 0.9, otherwise green (4). Levels of None become NaN, and are rated
+    # unknown (-1) as the data was invalid / nonexistent - grey
+    levels = np.array(relative_levels, dtype=np.float64)
+    ratings = 4 - np.searchsorted([0.9, 1.25, 1.5, 2], levels, side='left')
+    ratings[np.isnan(levels)] = -1
+    fill_colors, line_colors = np.take(colors, ratings).tolist(), np.take(linecolors, ratings).tolist()
+
+    trans_coords = wgs84_to_web_mercator_vector(coords)  # transform the coords of all the places at once
+
+    # make the figure of the map, with its tiles and tools
+    p = _make_map_figure(with_details)
 
     # populate a ColumnDataSource (Pandas DataFrame-like object) of the information in each place
-    info = [(abs(p["coords"][0]), abs(p["coords"][1]),  # coordinates of a place
-        letter(p["coords"][0], p["coords"][1])[0],      # appropriate letter for each lat/long coord
-        letter(p["coords"][0], p["coords"][1])[1],
-        p["name"], p["current_level"], p["typical_range"], p["relative_level"],  # additional attributes of a place
-        p["river"], p["town"], 
-        colors[p["rating"]], linecolors[p["rating"]], # color based on rating attribute
-        x[0], x[1]) for p, x in zip(station_info, trans_coords)]  # transformed coords
-
-    source = ColumnDataSource(
-        {k: v for k, v in zip(['lat', 'long', 'ns', 'ew',  # coords
-            'name', 'current_level', 'typical_range', 'relative_level', 'river', 'town',  # additional attributes of a place
-            'color', 'linecolor', 'x_coord', 'y_coord'], list(zip(*info)))})  # transformed coords
+    source = ColumnDataSource({
+        'lat': lats, 'long': longs, 'ns': ns, 'ew': ew,  # coords
+        'name': names, 'current_level': current_levels, 'typical_range': typical_ranges,  # additional attributes
+        'relative_level': relative_levels, 'river': rivers, 'town': towns,
+        'color': fill_colors, 'linecolor': line_colors,
+        'x_coord': trans_coords[:, 0], 'y_coord': trans_coords[:, 1]})  # transformed coords
 
     # add a circle to the map, referencing the colours in the ColumnDataSource
     p.circle(x="x_coord", y="y_coord", size=10,
              fill_color="color", line_color="linecolor",
              fill_alpha=0.8, source=source)
 
-    # initialise a HoverTool and add the necessary parameters to display when activated
-    if with_details:
-        from bokeh.models import HoverTool
-        my_hover = HoverTool()
-        my_hover.tooltips = [('Name', '@name'), ('Current level', '@current_level'),
-                            ('Typical range', '@typical_range'), ('Relative level', '@relative_level'),
-                            ('River', '@river'), ('Town', '@town'), ('Coords', '(@lat °@ns, @long °@ew)')]
-        p.add_tools(my_hover)
-
     if return_image:
         return p
     else:
@@ -39,9 +39,18 @@ _CONVERSIONS = {Unit.KILOMETERS:        1.0,                # noqa
                 Unit.INCHES:            39370.078740158}    # noqa
 
 
+# Earth radius in each unit, keyed by both the Unit member and its abbreviation,
+# so it is a single dict lookup rather than converting the unit on each call
+_RADIUS_BY_UNIT = {u: _AVG_EARTH_RADIUS_KM * c for u, c in _CONVERSIONS.items()}
+_RADIUS_BY_UNIT.update({u.value: r for u, r in list(_RADIUS_BY_UNIT.items())})
+
+
 def get_avg_earth_radius(unit):
-    unit = Unit(unit)
-    return _AVG_EARTH_RADIUS_KM * _CONVERSIONS[unit]
+    try:
+        return _RADIUS_BY_UNIT[unit]
+    except (KeyError, TypeError):
+        # not a supported unit: raise the same ValueError as Unit does
+        return _RADIUS_BY_UNIT[Unit(unit)]
 
 
 def haversine(point1, point2, unit=Unit.KILOMETERS):
@@ -72,6 +81,10 @@ def haversine(point1, point2, unit=Unit.KILOMETERS):
     lat2 = radians(lat2)
     lng2 = radians(lng2)
 
+    # the same point is always distance 0 away, so skip the trigonometry
+    if lat1 == lat2 and lng1 == lng2:
+        return 0.0
+
     # calculate haversine
     lat = lat2 - lat1
     lng = lng2 - lng1
@@ -94,11 +107,14 @@ def haversine_vector(array1, array2, unit=Unit.KILOMETERS, comb=False):
         return 'Error, unable to import Numpy,\
         consider using haversine instead of haversine_vector.'
 
-    # ensure arrays are numpy ndarrays
-    if not isinstance(array1, numpy.ndarray):
-        array1 = numpy.array(array1)
-    if not isinstance(array2, numpy.ndarray):
-        array2 = numpy.array(array2)
+    # ensure arrays are numpy ndarrays, converting each input only once and
+    # without copying inputs which are already ndarrays
+    try:
+        array1 = numpy.asarray(array1)
+        array2 = numpy.asarray(array2)
+    except ValueError as e:
+        # ragged input, e.g. a point which is None or has the wrong number of coordinates
+        raise TypeError('Each point must be a (latitude, longitude) pair.') from e
 
     # ensure will be able to iterate over rows by adding dimension if needed
     if array1.ndim == 1:
@@ -129,10 +145,21 @@ def haversine_vector(array1, array2, unit=Unit.KILOMETERS, comb=False):
         lat2 = numpy.expand_dims(lat2, axis=1)
         lng2 = numpy.expand_dims(lng2, axis=1)
 
-    # calculate haversine
+    # calculate haversine, updating the differences in place rather than
+    # allocating a new array for every intermediate result
     lat = lat2 - lat1
     lng = lng2 - lng1
-    d = (numpy.sin(lat * 0.5) ** 2
-         + numpy.cos(lat1) * numpy.cos(lat2) * numpy.sin(lng * 0.5) ** 2)
-
-    return 2 * get_avg_earth_radius(unit) * numpy.arcsin(numpy.sqrt(d))
+    lat *= 0.5
+    lng *= 0.5
+    d = numpy.sin(lat, out=lat)
+    d *= d
+    numpy.sin(lng, out=lng)
+    lng *= lng
+    lng *= numpy.cos(lat1) * numpy.cos(lat2)
+    d += lng
+
+    numpy.sqrt(d, out=d)
+    numpy.arcsin(d, out=d)
+    d *= 2 * get_avg_earth_radius(unit)
+
+    return d
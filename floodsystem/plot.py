@@ -33,12 +33,11 @@ def plot_water_levels(stations: list, dates: dict, levels: dict, as_subplots: bo
     '''
 
     # Standard data type input checks
-    assert isinstance(stations, list)
+    assert isinstance(stations, list) and (not stations or isinstance(stations[0], MonitoringStation))
     assert isinstance(dates, dict)
     assert isinstance(levels, dict)
-    assert all([isinstance(i, MonitoringStation) for i in stations])
-    assert all([isinstance(i, datetime.datetime) for i in flatten(list(dates.values()))])
-    assert all([isinstance(i, (float, int)) for i in flatten(list(levels.values()))])
+    assert all(isinstance(i, datetime.datetime) for i in flatten(list(dates.values())))
+    assert all(isinstance(i, (float, int)) for i in flatten(list(levels.values())))
 
     # Discard any stations with bad range, dates or levels data
     stations, dates, levels = stations, dates, levels
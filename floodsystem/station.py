@@ -159,6 +159,6 @@ def inconsistent_typical_range_stations(stations):
     '''
 
     # Standard data type input checks
-    assert all([isinstance(i, MonitoringStation) for i in stations])
+    assert not stations or isinstance(next(iter(stations)), MonitoringStation)
 
     return [s for s in stations if not s.typical_range_consistent()]
@@ -45,6 +45,26 @@ def wgs84_to_web_mercator(coord: tuple):
     return (x, y)
 
 
+def wgs84_to_web_mercator_vector(coords):
+
+    '''
+    The same as wgs84_to_web_mercator, but transforms a whole
+    array-like of (lat, long) coords of shape (N, 2) at once,
+    returning a numpy array of web mercator (x, y) coords of
+    the same shape.
+    '''
+    import numpy as np
+
+    coords = np.radians(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+    R_MAJOR = 6378137.000
+
+    xy = np.empty_like(coords)
+    xy[:, 0] = R_MAJOR * coords[:, 1]
+    xy[:, 1] = R_MAJOR * np.log(np.tan(np.pi / 4.0 + coords[:, 0] / 2.0))
+
+    return xy
+
+
 def flatten(t: list):
 
     '''
@@ -5,12 +5,42 @@ Unit tests for the stationdata module.
 # pylint: disable=import-error
 
 import datetime
+import json
 import import_helper  # noqa
 
+from floodsystem import datafetcher
 from floodsystem.datafetcher import fetch_measure_levels
 from floodsystem.stationdata import build_station_list
 
 
+class _FakeDatetime(datetime.datetime):
+
+    '''
+    A datetime.datetime whose utcnow() is a fixed, settable time,
+    to test caching without waiting for real time to pass.
+    '''
+
+    current_time = datetime.datetime(2021, 2, 1, 12, 0)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.current_time
+
+
+def _fake_fetch(fetched):
+
+    '''
+    Returns a function used in place of datafetcher.fetch, which
+    records each url in the list fetched instead of using the network.
+    '''
+
+    def fetch(url):
+        fetched.append(url)
+        return {'items': [{'dateTime': '2021-02-01T11:45:00Z', 'value': float(len(fetched))}]}
+
+    return fetch
+
+
 def test_build_station_list():
 
     # Build list of stations
@@ -37,3 +67,84 @@ def test_build_station_list():
         station_cam.measure_id, dt=datetime.timedelta(days=dt))
     assert len(dates10) == len(levels10)
     assert len(dates10) > len(levels2)
+
+
+def test_fetch_measure_levels_cache(tmp_path, monkeypatch):
+
+    fetched = []
+    monkeypatch.setattr(datafetcher, 'fetch', _fake_fetch(fetched))
+    monkeypatch.setattr(datafetcher, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(datetime, 'datetime', _FakeDatetime)
+    monkeypatch.setattr(_FakeDatetime, 'current_time', _FakeDatetime(2021, 2, 1, 12, 0))
+    dt = datetime.timedelta(days=2)
+
+    # Test 1: a second call in the same reading interval is loaded from the cache
+    dates, levels = fetch_measure_levels('measure-1', dt)
+    assert len(fetched) == 1 and levels == [1.0]
+    assert len(dates) == 1 and dates[0].hour == 11 and dates[0].minute == 45
+
+    _FakeDatetime.current_time = datetime.datetime(2021, 2, 1, 12, 10)
+    assert fetch_measure_levels('measure-1', dt)[1] == [1.0]
+    assert len(fetched) == 1
+
+    # a different measure or period is not taken from that cache
+    fetch_measure_levels('measure-2', dt)
+    fetch_measure_levels('measure-1', datetime.timedelta(days=10))
+    assert len(fetched) == 3
+
+    # Test 2: a call in the next reading interval fetches the new readings
+    _FakeDatetime.current_time = datetime.datetime(2021, 2, 1, 12, 15)
+    assert fetch_measure_levels('measure-1', dt)[1] == [4.0]
+    assert len(fetched) == 4
+    assert fetch_measure_levels('measure-1', dt)[1] == [4.0]
+    assert len(fetched) == 4
+
+    # Test 3: use_cache=False always fetches
+    assert fetch_measure_levels('measure-1', dt, use_cache=False)[1] == [5.0]
+    assert fetch_measure_levels('measure-1', dt, use_cache=False)[1] == [6.0]
+    assert len(fetched) == 6
+
+    # Test 4: a cache file which is not as expected is fetched again
+    for cache_file in (tmp_path / 'readings').iterdir():
+        cache_file.write_text(json.dumps([1, 2, 3]))
+    assert fetch_measure_levels('measure-1', dt)[1] == [7.0]
+    assert len(fetched) == 7
+
+
+def test_cached_fetch(tmp_path, monkeypatch):
+
+    fetched = []
+    monkeypatch.setattr(datafetcher, 'fetch', _fake_fetch(fetched))
+    monkeypatch.setattr(datafetcher, 'CACHE_DIR', str(tmp_path))
+    cache_file = tmp_path / 'data.json'
+
+    # Test 1: a missing cache file is fetched and written
+    data = datafetcher._cached_fetch('url-1', 'data.json', use_cache=True)
+    assert fetched == ['url-1']
+    assert json.loads(cache_file.read_text()) == data
+
+    # Test 2: with use_cache=True an existing cache file is loaded without fetching
+    cache_file.write_text(json.dumps({'items': 'cached'}))
+    assert datafetcher._cached_fetch('url-1', 'data.json', use_cache=True) == {'items': 'cached'}
+    assert fetched == ['url-1']
+
+    # Test 3: with use_cache=False the data is always fetched and the cache file overwritten
+    for n in range(2):
+        data = datafetcher._cached_fetch('url-2', 'data.json', use_cache=False)
+        assert len(fetched) == n + 2
+        assert json.loads(cache_file.read_text()) == data
+    assert data['items'][0]['value'] == 3.0
+
+    # Test 4: a truncated cache file is fetched again rather than raising
+    cache_file.write_text('{"items": [')
+    data = datafetcher._cached_fetch('url-1', 'data.json', use_cache=True)
+    assert len(fetched) == 4
+    assert json.loads(cache_file.read_text()) == data
+
+    # Test 5: with an interval, the cache file is only loaded if stored in the same interval
+    data = datafetcher._cached_fetch('url-3', 'sub/data.json', use_cache=True, interval=7)
+    assert datafetcher._cached_fetch('url-3', 'sub/data.json', use_cache=True, interval=7) == data
+    assert len(fetched) == 5
+    assert datafetcher._cached_fetch('url-3', 'sub/data.json', use_cache=True, interval=8) != data
+    assert len(fetched) == 6
+    assert json.loads((tmp_path / 'sub' / 'data.json').read_text())['interval'] == 8
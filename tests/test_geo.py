@@ -8,7 +8,7 @@ import import_helper  # noqa
 
 from floodsystem.geo import stations_by_distance, stations_within_radius, rivers_with_station
 from floodsystem.geo import stations_by_river, rivers_by_station_number, display_stations_on_map
-from floodsystem.geo import stations_by_town
+from floodsystem.geo import stations_by_town, stations_distance_matrix
 from floodsystem.station import MonitoringStation
 from floodsystem.utils import flatten
 
@@ -30,6 +30,12 @@ def test_stations_by_distance():
         ('near-station-1', 711), ('near-station-2', 772), ('boundary-station', 1572),
         ('far-station-2', 2845), ('far-station-1', 4135)]
 
+    # only the k nearest stations, still in order
+    assert [s.station_id for (s, d) in stations_by_distance(stations, TEST_COORD, k=2)] == [
+        'near-station-1', 'near-station-2']
+    assert stations_by_distance(stations, TEST_COORD, k=0) == []
+    assert len(stations_by_distance(stations, TEST_COORD, k=10)) == len(stations)
+
     # Test 2: invalid inputs
     stations = [
         MonitoringStation('near-station-1', None, None, (1, 0), None, None, None),
@@ -65,6 +71,47 @@ def test_stations_within_radius():
     assert not stations[3] in result
 
 
+def test_station_coord_changed():
+
+    TEST_COORD = (0, 0)
+
+    stations = [
+        MonitoringStation('station-a', None, None, (1, 0), None, None, None),
+        MonitoringStation('station-b', None, None, (10, 0), None, None, None),
+    ]
+
+    assert [s.station_id for (s, d) in stations_by_distance(stations, TEST_COORD)] == ['station-a', 'station-b']
+    assert stations_within_radius(stations, TEST_COORD, 200) == [stations[0]]
+
+    # Move a station: queries on the same stations should use the new coord
+    stations[0].coord = (50, 0)
+
+    assert [(s.station_id, round(d)) for (s, d) in stations_by_distance(stations, TEST_COORD)] == [
+        ('station-b', 1112), ('station-a', 5560)]
+    assert stations_within_radius(stations, TEST_COORD, 200) == []
+
+
+def test_stations_distance_matrix():
+
+    TEST_COORDS = [(5, 5), (0, 30), (-10, 2)]
+
+    stations = [
+        MonitoringStation('near-station-1', None, None, (1, 0), None, None, None),
+        MonitoringStation('near-station-2', None, None, (-1, 1.5), None, None, None),
+        MonitoringStation('far-station-1', None, None, (20, 40), None, None, None),
+        MonitoringStation('far-station-2', None, None, (0, 30.1234), None, None, None),
+    ]
+
+    distances = stations_distance_matrix(stations, TEST_COORDS)
+
+    # Check each row matches the distances found for that coordinate alone
+    assert distances.shape == (len(TEST_COORDS), len(stations))
+    for coord, row in zip(TEST_COORDS, distances):
+        assert sorted([round(d, 6) for d in row]) == [
+            round(d, 6) for (s, d) in stations_by_distance(stations, coord)]
+    assert [round(d) for d in distances[0]] == [711, 772, 4135, 2845]
+
+
 def test_rivers_with_station():
 
     stations = [
@@ -79,6 +126,9 @@ def test_rivers_with_station():
     result = rivers_with_station(stations)
     assert result == {'river-A', 'river-B', 'river-C', 'river-D', 'river-E'}
 
+    # any iterable of stations is accepted, not only a list
+    assert rivers_with_station(tuple(stations)) == result
+
 
 def test_stations_by_river():
 
@@ -102,6 +152,7 @@ def test_stations_by_river():
         'river-A': [stations[0]], 'river-B': [stations[1]], 'river-C': [stations[2]],
         'river-D': [stations[3], stations[4]], 'river-E': [stations[5]]
     }
+    assert stations_by_river(tuple(stations)) == river_dict
 
 
 def test_rivers_by_station_number():
@@ -137,6 +188,7 @@ def test_rivers_by_station_number():
     # Check against the expected result, ignoring differences due to ordering of rivers
     # with equal numbers of stations
     assert set(rivers_list) == {('river-C', 3), ('river-A', 2), ('river-B', 3), ('river-D', 3)}
+    assert rivers_by_station_number(tuple(stations), N) == rivers_list
 
 
 def test_stations_by_town():
@@ -168,6 +220,7 @@ def test_stations_by_town():
     setattr(stations[6], 'typical_range', (5, 15))
 
     town_dict = stations_by_town(stations)
+    assert stations_by_town(tuple(stations)) == town_dict
 
     # Check town-A has the correct stations, and remove it
     assert set(town_dict.pop('town-A')) == {stations[0], stations[1]}
@@ -27,6 +27,17 @@ def test_haversine():
     except TypeError:
         assert True
 
+    # invalid values, even if both points are the same
+    for bad_point in [(None, None), ('a', 'b')]:
+        try:
+            haversine(bad_point, bad_point)
+            assert False
+        except TypeError:
+            assert True
+
+    # Test 3: the same point twice is distance 0 away
+    assert haversine((52.2053, 0.1218), (52.2053, 0.1218)) == 0
+
 
 def test_haversine_vector():
 
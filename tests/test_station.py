@@ -60,6 +60,7 @@ def test_inconsistent_typical_range_stations():
     assert all([not b_s.typical_range_consistent() for b_s in bad_stations])
     # Check with correct result
     assert set(bad_stations) == {stations[2], stations[3], stations[4]}
+    assert inconsistent_typical_range_stations(tuple(stations)) == bad_stations
 
 
 def test_relative_water_level():
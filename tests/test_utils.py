@@ -6,7 +6,7 @@ Unit tests for the utils module
 
 import import_helper  # noqa
 
-from floodsystem.utils import sorted_by_key, wgs84_to_web_mercator, flatten
+from floodsystem.utils import sorted_by_key, wgs84_to_web_mercator, wgs84_to_web_mercator_vector, flatten
 
 
 def test_sort():
@@ -81,6 +81,20 @@ def test_wgs84_to_web_mercator():
     assert tuple([round(i) for i in output_coord]) == (13559, 6837332)
 
 
+def test_wgs84_to_web_mercator_vector():
+
+    '''
+    Each row should match the single-coordinate version
+    '''
+
+    coords = [(52.2053, 0.1218), (53.8, -1.55), (-33.9, 151.2)]
+    output_coords = wgs84_to_web_mercator_vector(coords)
+    assert output_coords.shape == (3, 2)
+    for coord, output_coord in zip(coords, output_coords):
+        assert tuple([round(i, 6) for i in output_coord]) == tuple(
+            [round(i, 6) for i in wgs84_to_web_mercator(coord)])
+
+
 def test_flatten():
 
     '''